@@ -1,11 +1,16 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Dict, Any
+from fastapi.responses import ORJSONResponse
+from typing import Dict, Any
+import heapq
 import uuid
-import json
 from datetime import datetime
 
-app = FastAPI(title="Receiptor AI", description="Simple Receipt Management API")
+app = FastAPI(
+    title="Receiptor AI",
+    description="Simple Receipt Management API",
+    default_response_class=ORJSONResponse
+)
 
 # Enable CORS
 app.add_middleware(
@@ -26,8 +31,9 @@ categories = [
 
 def mock_ai_processing(filename: str) -> Dict[str, Any]:
     """Mock AI processing that returns realistic data"""
+    name = filename.lower()
     mock_data = {
-        "vendor_name": "Starbucks Coffee" if "starbucks" in filename.lower() else "Business Vendor",
+        "vendor_name": "Starbucks Coffee" if "starbucks" in name else "Business Vendor",
         "total_amount": 15.50,
         "tax_amount": 1.24,
         "date": datetime.now().isoformat(),
@@ -36,11 +42,11 @@ def mock_ai_processing(filename: str) -> Dict[str, Any]:
     }
     
     # Simple category assignment
-    if "starbucks" in filename.lower() or "coffee" in filename.lower():
+    if "starbucks" in name or "coffee" in name:
         category = "meals_entertainment"
-    elif "gas" in filename.lower() or "fuel" in filename.lower():
+    elif "gas" in name or "fuel" in name:
         category = "fuel"
-    elif "office" in filename.lower():
+    elif "office" in name:
         category = "office_supplies"
     else:
         category = "other"
@@ -62,8 +68,8 @@ async def upload_receipt(file: UploadFile = File(...)):
         # Generate receipt ID
         receipt_id = str(uuid.uuid4())
         
-        # Read file content
-        content = await file.read()
+        # Starlette has already spooled the upload and recorded its size
+        file_size = file.size
         
         # Mock AI processing
         ai_result = mock_ai_processing(file.filename)
@@ -72,7 +78,7 @@ async def upload_receipt(file: UploadFile = File(...)):
         receipt = {
             "id": receipt_id,
             "filename": file.filename,
-            "file_size": len(content),
+            "file_size": file_size,
             "mime_type": file.content_type,
             "upload_timestamp": datetime.now().isoformat(),
             "processing_status": "completed",
@@ -91,17 +97,15 @@ async def upload_receipt(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 @app.get("/api/receipts")
-async def get_receipts(category: str = None, limit: int = 100):
+async def get_receipts(category: str = None, limit: int = Query(100, ge=0)):
     """Get all receipts with optional filtering"""
-    receipts = list(receipts_store.values())
+    receipts = receipts_store.values()
     
     if category:
-        receipts = [r for r in receipts if r.get("category") == category]
-    
-    # Sort by upload time (newest first)
-    receipts.sort(key=lambda x: x["upload_timestamp"], reverse=True)
+        receipts = (r for r in receipts if r.get("category") == category)
     
-    return receipts[:limit]
+    # Newest first; only the returned page is ordered
+    return heapq.nlargest(limit, receipts, key=lambda x: x["upload_timestamp"])
 
 @app.get("/api/receipts/{receipt_id}")
 async def get_receipt(receipt_id: str):
@@ -127,7 +131,6 @@ async def update_receipt(receipt_id: str, update_data: Dict[str, Any]):
     if "tags" in update_data:
         receipt["tags"] = update_data["tags"]
     
-    receipts_store[receipt_id] = receipt
     return receipt
 
 @app.delete("/api/receipts/{receipt_id}")
@@ -142,16 +145,15 @@ async def delete_receipt(receipt_id: str):
 @app.get("/api/analytics/summary")
 async def get_analytics_summary():
     """Get receipt analytics summary"""
-    receipts = list(receipts_store.values())
-    
-    total_receipts = len(receipts)
-    total_amount = sum(r.get("extracted_data", {}).get("total_amount", 0) for r in receipts)
+    total_receipts = len(receipts_store)
+    total_amount = 0
     
-    # Category breakdown
+    # Category breakdown, accumulated in a single pass over the store
     category_breakdown = {}
-    for receipt in receipts:
+    for receipt in receipts_store.values():
         category = receipt.get("category", "other")
         amount = receipt.get("extracted_data", {}).get("total_amount", 0)
+        total_amount += amount
         
         if category not in category_breakdown:
             category_breakdown[category] = {"count": 0, "total_amount": 0}
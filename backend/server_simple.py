@@ -1,15 +1,19 @@
-from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException, Depends, BackgroundTasks, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 import os
+import asyncio
+import shutil
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 import uuid
+from collections import defaultdict
+from itertools import islice
 from datetime import datetime
-import json
 from enum import Enum
 
 # Setup
@@ -24,7 +28,11 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Create the main app
-app = FastAPI(title="Receiptor AI", description="Intelligent Receipt Management System")
+app = FastAPI(
+    title="Receiptor AI",
+    description="Intelligent Receipt Management System",
+    default_response_class=ORJSONResponse
+)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -36,12 +44,22 @@ security = HTTPBearer()
 UPLOAD_DIR = ROOT_DIR / "uploads"
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+# Content types accepted by the upload endpoint
+ALLOWED_MIME_TYPES = frozenset({'image/jpeg', 'image/png', 'image/jpg', 'application/pdf'})
+
 # In-memory storage for demo (replace with real database)
 receipts_db = {}
 rules_db = {}
 integrations_db = {}
 audit_log_db = []
 
+# Per-user indexes over receipts_db / rules_db / audit_log_db so user-scoped
+# listings don't scan every stored record. Entries are shared by reference
+# with the primary stores, so every write path must update both.
+receipts_by_user = defaultdict(dict)
+rules_by_user = defaultdict(dict)
+audit_log_by_user = defaultdict(list)
+
 # Define Enums
 class ReceiptCategory(str, Enum):
     OFFICE_SUPPLIES = "office_supplies"
@@ -130,6 +148,12 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
     # Simple mock authentication - replace with proper JWT validation
     return "user123"  # Mock user ID
 
+def save_upload(source, file_path: Path) -> int:
+    """Copy an uploaded file to disk in 1 MiB chunks and return its size"""
+    with open(file_path, 'wb') as f:
+        shutil.copyfileobj(source, f, 1024 * 1024)
+        return f.tell()
+
 def mock_ai_processing(file_path: str, mime_type: str) -> Dict[str, Any]:
     """Mock AI processing function"""
     return {
@@ -151,6 +175,25 @@ def mock_ai_processing(file_path: str, mime_type: str) -> Dict[str, Any]:
         "manual_review_needed": False
     }
 
+def process_receipt(receipt: Receipt):
+    """Run mock AI processing for a stored receipt and record the result"""
+    try:
+        receipt.processing_status = ProcessingStatus.PROCESSING
+        
+        # Process with mock AI
+        ai_result = mock_ai_processing(receipt.file_path, receipt.mime_type)
+        
+        # Update receipt with AI results
+        receipt.extracted_data = ExtractedData(**ai_result["extracted_data"])
+        receipt.category = ai_result["category"]
+        receipt.confidence_score = ai_result["confidence_score"]
+        receipt.manual_review_needed = ai_result["manual_review_needed"]
+        receipt.processing_status = ProcessingStatus.COMPLETED
+        
+    except Exception as e:
+        logger.error(f"AI processing failed: {str(e)}")
+        receipt.processing_status = ProcessingStatus.FAILED
+
 # API Routes
 @api_router.get("/")
 async def root():
@@ -158,14 +201,14 @@ async def root():
 
 @api_router.post("/receipts/upload", response_model=Receipt)
 async def upload_receipt(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     user_id: str = Depends(get_current_user)
 ):
-    """Upload and process a receipt"""
+    """Upload a receipt and queue it for processing"""
     try:
         # Validate file type
-        allowed_types = ['image/jpeg', 'image/png', 'image/jpg', 'application/pdf']
-        if file.content_type not in allowed_types:
+        if file.content_type not in ALLOWED_MIME_TYPES:
             raise HTTPException(status_code=400, detail="Unsupported file type")
         
         # Generate unique filename
@@ -175,57 +218,39 @@ async def upload_receipt(
         file_path = UPLOAD_DIR / unique_filename
         
         # Save file
-        content = await file.read()
-        with open(file_path, 'wb') as f:
-            f.write(content)
+        file_size = await asyncio.to_thread(save_upload, file.file, file_path)
         
         # Create receipt record
         receipt = Receipt(
             user_id=user_id,
             filename=file.filename,
             file_path=str(file_path),
-            file_size=len(content),
+            file_size=file_size,
             mime_type=file.content_type,
             processing_status=ProcessingStatus.PENDING
         )
         
         # Store in memory database
         receipts_db[receipt.id] = receipt
+        receipts_by_user[user_id][receipt.id] = receipt
+        
+        # Log audit event
+        audit_event = {
+            "event_type": "receipt_uploaded",
+            "user_id": user_id,
+            "timestamp": datetime.utcnow(),
+            "resource_id": receipt.id,
+            "details": {
+                "filename": file.filename,
+                "file_size": file_size,
+                "mime_type": file.content_type
+            }
+        }
+        audit_log_db.append(audit_event)
+        audit_log_by_user[user_id].append(audit_event)
         
-        # Mock AI processing
-        try:
-            receipt.processing_status = ProcessingStatus.PROCESSING
-            
-            # Process with mock AI
-            ai_result = mock_ai_processing(str(file_path), file.content_type)
-            
-            # Update receipt with AI results
-            receipt.extracted_data = ExtractedData(**ai_result["extracted_data"])
-            receipt.category = ai_result["category"]
-            receipt.confidence_score = ai_result["confidence_score"]
-            receipt.manual_review_needed = ai_result["manual_review_needed"]
-            receipt.processing_status = ProcessingStatus.COMPLETED
-            
-            # Update in database
-            receipts_db[receipt.id] = receipt
-            
-            # Log audit event
-            audit_log_db.append({
-                "event_type": "receipt_uploaded",
-                "user_id": user_id,
-                "timestamp": datetime.utcnow(),
-                "resource_id": receipt.id,
-                "details": {
-                    "filename": file.filename,
-                    "file_size": len(content),
-                    "mime_type": file.content_type
-                }
-            })
-            
-        except Exception as e:
-            logger.error(f"AI processing failed: {str(e)}")
-            receipt.processing_status = ProcessingStatus.FAILED
-            receipts_db[receipt.id] = receipt
+        # Mock AI processing runs after the response is sent
+        background_tasks.add_task(process_receipt, receipt)
         
         return receipt
         
@@ -238,19 +263,19 @@ async def get_receipts(
     user_id: str = Depends(get_current_user),
     category: Optional[ReceiptCategory] = None,
     status: Optional[ProcessingStatus] = None,
-    limit: int = 100,
-    offset: int = 0
+    limit: int = Query(100, ge=0),
+    offset: int = Query(0, ge=0)
 ):
     """Get user's receipts with optional filtering"""
-    user_receipts = [r for r in receipts_db.values() if r.user_id == user_id]
+    user_receipts = receipts_by_user.get(user_id, {}).values()
     
     if category:
-        user_receipts = [r for r in user_receipts if r.category == category]
+        user_receipts = (r for r in user_receipts if r.category == category)
     if status:
-        user_receipts = [r for r in user_receipts if r.processing_status == status]
+        user_receipts = (r for r in user_receipts if r.processing_status == status)
     
-    # Apply pagination
-    return user_receipts[offset:offset + limit]
+    # Apply pagination, stopping once the page is filled
+    return list(islice(user_receipts, offset, offset + limit))
 
 @api_router.get("/receipts/{receipt_id}", response_model=Receipt)
 async def get_receipt(
@@ -291,7 +316,6 @@ async def update_receipt(
     if update_data.extracted_data is not None:
         receipt.extracted_data = update_data.extracted_data
     
-    receipts_db[receipt_id] = receipt
     return receipt
 
 @api_router.delete("/receipts/{receipt_id}")
@@ -310,11 +334,13 @@ async def delete_receipt(
     # Delete file
     try:
         os.remove(receipt.file_path)
-    except:
-        pass  # File might already be deleted
+    except OSError as e:
+        # File might already be deleted; the record is removed regardless
+        logger.warning(f"Could not remove receipt file {receipt.file_path}: {str(e)}")
     
     # Delete from database
     del receipts_db[receipt_id]
+    del receipts_by_user[user_id][receipt_id]
     
     return {"message": "Receipt deleted successfully"}
 
@@ -327,34 +353,35 @@ async def create_ai_rule(
     """Create an AI processing rule"""
     rule = AIRule(**rule_data.dict())
     rules_db[rule.id] = rule
+    rules_by_user[rule.user_id][rule.id] = rule
     return rule
 
 @api_router.get("/ai-rules", response_model=List[AIRule])
 async def get_ai_rules(user_id: str = Depends(get_current_user)):
     """Get user's AI rules"""
-    return [rule for rule in rules_db.values() if rule.user_id == user_id]
+    return list(rules_by_user.get(user_id, {}).values())
 
 # Analytics endpoints
 @api_router.get("/analytics/summary")
 async def get_analytics_summary(user_id: str = Depends(get_current_user)):
     """Get receipt analytics summary"""
-    user_receipts = [r for r in receipts_db.values() if r.user_id == user_id]
+    user_receipts = receipts_by_user.get(user_id, {})
     
     total_receipts = len(user_receipts)
-    total_amount = sum(
-        r.extracted_data.total_amount or 0 
-        for r in user_receipts 
-        if r.extracted_data and r.extracted_data.total_amount
-    )
+    total_amount = 0
     
-    # Category breakdown
+    # Total and category breakdown, accumulated in a single pass
     category_stats = {}
-    for receipt in user_receipts:
-        if receipt.category and receipt.extracted_data and receipt.extracted_data.total_amount:
+    for receipt in user_receipts.values():
+        amount = receipt.extracted_data.total_amount if receipt.extracted_data else None
+        if not amount:
+            continue
+        total_amount += amount
+        if receipt.category:
             if receipt.category not in category_stats:
                 category_stats[receipt.category] = {"count": 0, "total_amount": 0}
             category_stats[receipt.category]["count"] += 1
-            category_stats[receipt.category]["total_amount"] += receipt.extracted_data.total_amount
+            category_stats[receipt.category]["total_amount"] += amount
     
     category_breakdown = [
         {"_id": category, **stats} 
@@ -372,13 +399,10 @@ async def get_analytics_summary(user_id: str = Depends(get_current_user)):
 @api_router.get("/audit/trail")
 async def get_audit_trail(
     user_id: str = Depends(get_current_user),
-    limit: int = 100
+    limit: int = Query(100, ge=1)
 ):
     """Get audit trail"""
-    user_events = [
-        event for event in audit_log_db 
-        if event.get("user_id") == user_id
-    ]
+    user_events = audit_log_by_user.get(user_id, [])
     return {
         "events": user_events[-limit:],
         "count": len(user_events)
@@ -70,6 +70,24 @@ const ReceiptUpload = () => {
     });
   };
 
+  const waitForProcessing = async (receipt) => {
+    // Uploads return before AI processing finishes; poll until it settles
+    let current = receipt;
+    for (let attempt = 0; attempt < 20; attempt++) {
+      if (!['pending', 'processing'].includes(current.processing_status)) break;
+      await new Promise(resolve => setTimeout(resolve, 500));
+      try {
+        const response = await receiptAPI.getById(current.id);
+        current = response.data;
+      } catch (error) {
+        // The upload itself succeeded; keep the last known state
+        console.error('Failed to refresh receipt status:', error);
+        break;
+      }
+    }
+    return current;
+  };
+
   const uploadFiles = async () => {
     if (files.length === 0) return;
 
@@ -95,11 +113,13 @@ const ReceiptUpload = () => {
         clearInterval(progressInterval);
         setUploadProgress(prev => ({ ...prev, [fileItem.id]: 100 }));
 
+        const receipt = await waitForProcessing(response.data);
+
         results.push({
           id: fileItem.id,
           filename: fileItem.file.name,
           status: 'success',
-          data: response.data
+          data: receipt
         });
 
         // Update file status
@@ -320,7 +340,11 @@ const ReceiptUpload = () => {
                       <span className="font-medium">{result.filename}</span>
                       {result.status === 'success' ? (
                         <span className="text-green-600 ml-2">
-                          Successfully uploaded and processed
+                          {result.data?.processing_status === 'failed'
+                            ? 'Uploaded, but processing failed'
+                            : result.data?.processing_status === 'completed'
+                              ? 'Successfully uploaded and processed'
+                              : 'Uploaded, processing in progress'}
                           {result.data?.extracted_data?.vendor_name && (
                             <span className="text-gray-600">
                               {' '}• Vendor: {result.data.extracted_data.vendor_name}
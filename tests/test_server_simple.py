@@ -0,0 +1,85 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import server_simple
+
+AUTH = {"Authorization": "Bearer test-token"}
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 16
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(server_simple, "UPLOAD_DIR", tmp_path)
+    for store in (
+        server_simple.receipts_db,
+        server_simple.rules_db,
+        server_simple.audit_log_db,
+        server_simple.receipts_by_user,
+        server_simple.rules_by_user,
+        server_simple.audit_log_by_user,
+    ):
+        store.clear()
+    return TestClient(server_simple.app)
+
+
+def upload(client, filename="receipt.png"):
+    response = client.post(
+        "/api/receipts/upload",
+        files={"file": (filename, PNG, "image/png")},
+        headers=AUTH,
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_user_index_follows_upload_and_delete(client):
+    receipt = upload(client)
+
+    listed = client.get("/api/receipts", headers=AUTH).json()
+    assert [r["id"] for r in listed] == [receipt["id"]]
+
+    response = client.delete(f"/api/receipts/{receipt['id']}", headers=AUTH)
+    assert response.status_code == 200
+
+    assert client.get("/api/receipts", headers=AUTH).json() == []
+    assert receipt["id"] not in server_simple.receipts_db
+    assert receipt["id"] not in server_simple.receipts_by_user["user123"]
+
+
+def test_rule_and_audit_indexes_follow_writes(client):
+    rule = {
+        "user_id": "user123",
+        "name": "Coffee",
+        "description": "Tag coffee receipts",
+        "conditions": {},
+        "actions": {},
+    }
+    created = client.post("/api/ai-rules", json=rule, headers=AUTH).json()
+    listed = client.get("/api/ai-rules", headers=AUTH).json()
+    assert [r["id"] for r in listed] == [created["id"]]
+
+    receipt = upload(client)
+    trail = client.get("/api/audit/trail", headers=AUTH).json()
+    assert trail["count"] == 1
+    assert trail["events"][0]["resource_id"] == receipt["id"]
+
+
+def test_upload_returns_pending_and_processes_in_background(client):
+    receipt = upload(client)
+    assert receipt["processing_status"] == "pending"
+    assert receipt["extracted_data"] is None
+
+    # TestClient runs background tasks before returning the response
+    processed = client.get(f"/api/receipts/{receipt['id']}", headers=AUTH).json()
+    assert processed["processing_status"] == "completed"
+    assert processed["extracted_data"]["vendor_name"] == "Starbucks Coffee"
+    assert processed["category"] == "meals_entertainment"
+
+
+@pytest.mark.parametrize("path", [
+    "/api/receipts?limit=-1",
+    "/api/receipts?offset=-1",
+    "/api/audit/trail?limit=0",
+])
+def test_listing_rejects_out_of_range_paging(client, path):
+    assert client.get(path, headers=AUTH).status_code == 422